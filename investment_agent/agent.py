@@ -8,7 +8,6 @@ import os
 from typing import Dict, List, Optional, Union
 from datetime import datetime
 
-from openai import OpenAI
 from agents import Agent, set_default_openai_key, set_tracing_disabled
 from agents.model_settings import ModelSettings
 
@@ -31,6 +31,9 @@ REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))  # Timeout for API req
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))  # Maximum number of retries for API requests
 RETRY_DELAY = int(os.getenv("RETRY_DELAY", "1"))  # Initial delay between retries in seconds
 RATE_LIMIT_DELAY = int(os.getenv("RATE_LIMIT_DELAY", "5"))  # Delay when hitting rate limits in seconds
+# Размер чанка при скачивании PDF. Отчеты SEC обычно весят 200 KB - 5 MB,
+# 256 KiB дает мало системных вызовов при умеренном расходе памяти.
+PDF_DOWNLOAD_CHUNK_SIZE = int(os.getenv("PDF_DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))  # Chunk size in bytes
 
 # Other configuration parameters
 CACHE_EXPIRY = int(os.getenv("CACHE_EXPIRY", "3600"))  # Cache expiry time in seconds (1 hour)
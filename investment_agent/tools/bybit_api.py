@@ -28,6 +28,10 @@ logger = logging.getLogger("bybit_api")
 # Конфигурация Bybit API
 BYBIT_BASE_URL = "https://api-testnet.bybit.com" if BYBIT_TESTNET else "https://api.bybit.com"
 
+# Общая HTTP-сессия: переиспользует соединения с API между вызовами инструментов
+# (get_crypto_history с auto_extend делает до 5 запросов подряд к одному хосту)
+_session = requests.Session()
+
 # Допустимые интервалы для исторических данных
 VALID_INTERVALS = ["1", "3", "5", "15", "30", "60", "120", "240", "360", "720", "D", "W", "M"]
 
@@ -49,7 +53,7 @@ def _make_api_request(endpoint: str, params: Dict = None) -> Dict:
     
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.get(url, params=params or {}, timeout=REQUEST_TIMEOUT)
+            response = _session.get(url, params=params or {}, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             
             data = response.json()
@@ -100,6 +100,10 @@ def discover_tools_from_module(module: Any) -> None:
         module: Модуль Python для сканирования
     """
     for name, item in inspect.getmembers(module, inspect.isfunction):
+        # Пропускаем приватные функции модуля
+        if name.startswith("_"):
+            continue
+            
         # Пропускаем функции из списка исключений
         if name in EXCLUDED_FUNCTIONS:
             continue
@@ -8,25 +8,55 @@ SEC Downloader - Модуль для скачивания отчетов SEC в
 Интегрирован с OpenAI Agents SDK для использования в качестве инструментов агента.
 """
 
+import concurrent.futures
 import requests
 import json
 import os
 import time
 import logging
 import random
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
 
 # Импортируем регистратор инструментов
 from .registry import register_tool
 
+# ijson нужен только для потокового разбора больших ответов (опционально)
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("sec_downloader")
 
 # Конфигурация
-from investment_agent.config import SEC_API_KEY, REQUEST_TIMEOUT, MAX_RETRIES, RETRY_DELAY
+from investment_agent.config import (
+    SEC_API_KEY, REQUEST_TIMEOUT, MAX_RETRIES, RETRY_DELAY, PDF_DOWNLOAD_CHUNK_SIZE, CACHE_EXPIRY
+)
+
+# HTTP-клиент. httpx с HTTP/2 мультиплексирует запросы к api.sec-api.io
+# по одному TLS-соединению; без пакета h2 используем пул соединений requests.
+try:
+    import httpx
+    import h2  # noqa: F401 - требуется httpx для http2=True
+    _http_client = httpx.Client(
+        http2=True,
+        follow_redirects=True,  # как requests по умолчанию
+        timeout=REQUEST_TIMEOUT,
+        headers={"Accept-Encoding": "gzip"}
+    )
+    _requests_session = None
+    _REQUEST_ERRORS = (httpx.HTTPError, requests.exceptions.RequestException)
+except ImportError:
+    _http_client = None
+    _requests_session = requests.Session()
+    _REQUEST_ERRORS = (requests.exceptions.RequestException,)
+
 API_KEY = SEC_API_KEY  # Ключ API из конфигурационного файла
 OUTPUT_DIR = "downloaded_filings"  # Директория для сохранения файлов
 
@@ -34,13 +64,61 @@ OUTPUT_DIR = "downloaded_filings"  # Директория для сохране
 QUERY_API_URL = "https://api.sec-api.io"  # Для поиска отчетов
 PDF_API_URL = "https://api.sec-api.io/filing-reader"  # Для конвертации в PDF
 
+# Диапазоны дат (MM-DD) для кварталов 1-4
+_QUARTER_RANGES = (
+    ("01-01", "03-31"),
+    ("04-01", "06-30"),
+    ("07-01", "09-30"),
+    ("10-01", "12-31"),
+)
+
+# Начиная с такого limit ответ Query API разбирается потоково (если доступен ijson)
+STREAM_PARSE_MIN_LIMIT = 50
+JSON_STREAM_CHUNK_SIZE = 64 * 1024  # Размер куска для потокового разбора, байт
+
+# Максимальное число одновременных скачиваний в download_filings_batch
+BATCH_DOWNLOAD_CONCURRENCY = 8
+
+# Кэш результатов поиска: query -> (время запроса, limit, список отчетов).
+# Составные инструменты (download_specific_filing, get_recent_filing и т.д.)
+# часто повторяют только что выполненный поиск - кэш избавляет от лишнего запроса к API.
+# При переполнении вытесняются самые старые записи.
+SEARCH_CACHE_MAX_ENTRIES = 256
+_search_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+# Поля отчета, которые возвращает search_filings (остальные поля ответа API отбрасываются)
+FILING_FIELDS = (
+    "linkToFilingDetails",
+    "filedAt",
+    "formType",
+    "description",
+    "companyName",
+    "periodOfReport",
+)
+
+def _iter_body(response, chunk_size: int):
+    """
+    Итерирует тело ответа кусками независимо от используемого HTTP-клиента.
+    
+    Args:
+        response: Ответ httpx или requests
+        chunk_size: Размер куска в байтах
+        
+    Returns:
+        Итератор по кускам тела ответа
+    """
+    if _http_client is not None:
+        return response.iter_bytes(chunk_size=chunk_size)
+    return response.iter_content(chunk_size=chunk_size)
+
 # Эта функция не будет декорирована @register_tool
 def api_request_with_retry(method, url, headers=None, params=None, json=None, stream=False, timeout=None):
     """
     Make API request with retry logic for rate limiting
     
     Args:
-        method: The HTTP method function to use (e.g., requests.get)
+        method: The HTTP method name (e.g., "GET", "POST")
         url: The URL to request
         headers: Optional headers dictionary
         params: Optional query parameters
@@ -49,7 +127,7 @@ def api_request_with_retry(method, url, headers=None, params=None, json=None, st
         timeout: Request timeout in seconds
         
     Returns:
-        The response object
+        The response object (httpx.Response or requests.Response)
     """
     retries = 0
     while retries < MAX_RETRIES:
@@ -62,26 +140,34 @@ def api_request_with_retry(method, url, headers=None, params=None, json=None, st
                 kwargs['params'] = params  
             if json is not None:
                 kwargs['json'] = json
-            if stream:
-                kwargs['stream'] = stream
             if timeout is not None:
                 kwargs['timeout'] = timeout
                 
             # Make the request
-            response = method(url, **kwargs)
+            if _http_client is not None:
+                request = _http_client.build_request(method, url, **kwargs)
+                response = _http_client.send(request, stream=stream)
+            else:
+                response = _requests_session.request(method, url, stream=stream, **kwargs)
             
             # Check if rate limited
             if response.status_code == 429:
+                response.close()
                 wait_time = RETRY_DELAY * (2 ** retries) + random.uniform(0, 1)
                 logger.warning(f"Rate limited. Waiting for {wait_time:.2f} seconds before retry.")
                 time.sleep(wait_time)
                 retries += 1
                 continue
                 
-            response.raise_for_status()
+            try:
+                response.raise_for_status()
+            except _REQUEST_ERRORS:
+                # Освобождаем соединение (или поток HTTP/2) перед повтором
+                response.close()
+                raise
             return response
             
-        except requests.exceptions.RequestException as e:
+        except _REQUEST_ERRORS as e:
             if retries >= MAX_RETRIES - 1:
                 raise
             
@@ -92,6 +178,41 @@ def api_request_with_retry(method, url, headers=None, params=None, json=None, st
             
     raise Exception(f"Failed after {MAX_RETRIES} retries")
 
+def _project_filing(filing: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Оставляет у отчета только поля из FILING_FIELDS.
+    
+    Args:
+        filing: Отчет из ответа Query API
+        
+    Returns:
+        Отчет с отобранными полями
+    """
+    return {field: filing[field] for field in FILING_FIELDS if field in filing}
+
+def _stream_filings(response) -> List[Dict[str, Any]]:
+    """
+    Потоково разбирает ответ Query API, оставляя у отчетов только поля из FILING_FIELDS.
+    
+    Args:
+        response: Ответ, полученный с stream=True
+        
+    Returns:
+        Список отчетов
+    """
+    filings = []
+    events = ijson.sendable_list()
+    parser = ijson.items_coro(events, "filings.item", use_float=True)
+    try:
+        for chunk in _iter_body(response, JSON_STREAM_CHUNK_SIZE):
+            parser.send(chunk)
+            filings.extend(_project_filing(filing) for filing in events)
+            del events[:]
+        parser.close()
+        return filings
+    finally:
+        response.close()
+
 @register_tool
 def search_filings(ticker: str, form_type: Optional[str] = None, 
                    start_date: Optional[str] = None, 
@@ -133,6 +254,21 @@ def search_filings(ticker: str, form_type: Optional[str] = None,
         except (ValueError, TypeError):
             actual_limit = 10
     
+    # Отчеты отсортированы по дате, поэтому выборка с большим limit подходит и для меньшего
+    with _search_cache_lock:
+        cached = _search_cache.get(query)
+        if cached is not None and time.time() - cached[0] >= CACHE_EXPIRY:
+            # Устаревшую запись удаляем сразу
+            del _search_cache[query]
+            cached = None
+    
+    if cached is not None:
+        cached_at, cached_limit, cached_filings = cached
+        if cached_limit >= actual_limit:
+            filings = cached_filings[:actual_limit]
+            logger.info(f"Найдено {len(filings)} отчетов для {ticker} (из кэша)")
+            return json.dumps({"ticker": ticker, "count": len(filings), "filings": filings})
+    
     # Формируем JSON для запроса
     payload = {
         "query": query,
@@ -147,20 +283,33 @@ def search_filings(ticker: str, form_type: Optional[str] = None,
         "Content-Type": "application/json"
     }
     
+    # Для больших выборок не держим в памяти весь ответ целиком
+    stream_parse = ijson is not None and actual_limit >= STREAM_PARSE_MIN_LIMIT
+    
     try:
         logger.info(f"Поиск отчетов для {ticker}")
         response = api_request_with_retry(
-            requests.post, 
+            "POST", 
             QUERY_API_URL, 
             headers=headers, 
             json=payload, 
+            stream=stream_parse,
             timeout=REQUEST_TIMEOUT
         )
         
-        data = response.json()
+        if stream_parse:
+            filings = _stream_filings(response)
+        else:
+            data = response.json()
+            
+            # Форматируем результаты (тот же набор полей, что и при потоковом разборе)
+            filings = [_project_filing(filing) for filing in data.get("filings", [])]
         
-        # Форматируем результаты
-        filings = data.get("filings", [])
+        with _search_cache_lock:
+            _search_cache[query] = (time.time(), actual_limit, filings)
+            _search_cache.move_to_end(query)
+            while len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+                _search_cache.popitem(last=False)
         
         result = {
             "ticker": ticker,
@@ -216,7 +365,7 @@ def download_filing_as_pdf(filing_url: str, output_filename: Optional[str] = Non
         
         # Делаем запрос
         response = api_request_with_retry(
-            requests.get,
+            "GET",
             PDF_API_URL,
             params=params,
             stream=True,
@@ -224,9 +373,12 @@ def download_filing_as_pdf(filing_url: str, output_filename: Optional[str] = Non
         )
         
         # Сохраняем файл
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        try:
+            with open(output_path, 'wb') as f:
+                for chunk in _iter_body(response, PDF_DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        finally:
+            response.close()
         
         logger.info(f"Документ успешно скачан: {output_path}")
         return json.dumps({"file_path": output_path, "success": True})
@@ -342,19 +494,12 @@ def search_filings_by_period(ticker: str, form_type: Optional[str] = None,
             year = int(year)
             if quarter is not None:
                 quarter = int(quarter)
+                if not 1 <= quarter <= 4:
+                    return json.dumps({"error": "Invalid quarter value"})
                 # Определяем диапазон дат для указанного квартала
-                if quarter == 1:
-                    start_date = f"{year}-01-01"
-                    end_date = f"{year}-03-31"
-                elif quarter == 2:
-                    start_date = f"{year}-04-01"
-                    end_date = f"{year}-06-30"
-                elif quarter == 3:
-                    start_date = f"{year}-07-01"
-                    end_date = f"{year}-09-30"
-                elif quarter == 4:
-                    start_date = f"{year}-10-01"
-                    end_date = f"{year}-12-31"
+                start_suffix, end_suffix = _QUARTER_RANGES[quarter - 1]
+                start_date = f"{year}-{start_suffix}"
+                end_date = f"{year}-{end_suffix}"
             else:
                 # Весь год
                 start_date = f"{year}-01-01"
@@ -424,13 +569,12 @@ def get_filing_list_summary(filings_data: str) -> str:
     if count == 0:
         return f"Для компании {ticker} не найдено отчетов с указанными параметрами."
     
-    result = f"Найдено {count} отчетов для {ticker}:\n\n"
-    
-    for i, filing in enumerate(data.get("filings", []), 1):
-        filing_summary = format_filing_summary(filing)
-        result += f"{i}. {filing_summary}\n"
+    lines = [
+        f"{i}. {format_filing_summary(filing)}\n"
+        for i, filing in enumerate(data.get("filings", []), 1)
+    ]
     
-    return result
+    return f"Найдено {count} отчетов для {ticker}:\n\n" + "".join(lines)
 
 @register_tool
 def get_company_quarterly_report(ticker: str, year: Optional[int] = None, quarter: Optional[int] = None) -> str:
@@ -651,4 +795,78 @@ def download_specific_filing(ticker: str, form_type: str, filing_index: Optional
         
     except Exception as e:
         logger.error(f"Error in download_specific_filing: {str(e)}")
-        return json.dumps({"error": str(e)})
\ No newline at end of file
+        return json.dumps({"error": str(e)})
+
+@register_tool
+def download_filings_batch(ticker: str, form_type: Optional[str] = None, limit: Optional[int] = None) -> str:
+    """
+    Download several recent SEC filings for a company as PDF files in parallel.
+    
+    Args:
+        ticker: The stock ticker symbol of the company (e.g., 'AAPL')
+        form_type: The type of filing to retrieve (e.g., '10-K', '10-Q', '8-K')
+        limit: Maximum number of filings to download
+        
+    Returns:
+        JSON строка со списком скачанных файлов и ошибок
+    """
+    try:
+        # Если limit не указан, используем значение по умолчанию
+        actual_limit = 5
+        if limit is not None:
+            try:
+                actual_limit = int(limit)
+            except (ValueError, TypeError):
+                actual_limit = 5
+        
+        result = json.loads(search_filings(ticker, form_type, limit=actual_limit))
+        
+        if "error" in result:
+            return json.dumps({"error": result["error"]})
+        
+        # Собираем URL отчетов и имена файлов
+        downloads = []
+        used_filenames = set()
+        for filing in result.get("filings", []):
+            filing_url = filing.get("linkToFilingDetails")
+            if not filing_url:
+                continue
+            
+            # Типы вроде "10-K/A" содержат "/", недопустимый в имени файла
+            form_type_for_filename = str(filing.get("formType", form_type or "filing")).replace("/", "-")
+            filed_date = filing.get("filedAt", "")[:10] if filing.get("filedAt") else "unknown_date"
+            output_filename = f"{ticker}_{form_type_for_filename}_{filed_date}.pdf"
+            
+            # Несколько отчетов одного типа могут быть поданы в один день
+            suffix = 1
+            while output_filename in used_filenames:
+                suffix += 1
+                output_filename = f"{ticker}_{form_type_for_filename}_{filed_date}_{suffix}.pdf"
+            used_filenames.add(output_filename)
+            
+            downloads.append((filing_url, output_filename))
+        
+        if not downloads:
+            return json.dumps({"error": f"No filings found for {ticker}"})
+        
+        logger.info(f"Скачивание {len(downloads)} отчетов для {ticker}")
+        
+        # Скачивание упирается в сеть, поэтому потоки работают параллельно; все они
+        # используют общий HTTP-клиент и повторные попытки api_request_with_retry
+        with concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_DOWNLOAD_CONCURRENCY) as executor:
+            download_results = [
+                json.loads(download_result)
+                for download_result in executor.map(lambda d: download_filing_as_pdf(*d), downloads)
+            ]
+        
+        file_paths = [r["file_path"] for r in download_results if r.get("success")]
+        errors = [r["error"] for r in download_results if "error" in r]
+        
+        return json.dumps({
+            "result": f"Downloaded {len(file_paths)} of {len(downloads)} reports for {ticker}",
+            "file_paths": file_paths,
+            "errors": errors
+        })
+    except Exception as e:
+        logger.error(f"Error in download_filings_batch: {str(e)}")
+        return json.dumps({"error": str(e)})